@@ -20,26 +20,39 @@ the mounted service account token for authentication.
 """
 
 import os
+import re
+import select
 import sys
 import logging
 import secrets
 import string
-import base64
-import json
-from typing import Optional, Dict, Any
+import socket
+import ssl
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 
-import mysql.connector
-from mysql.connector import Error
-import requests
-from requests.exceptions import RequestException
+import orjson
 
 
-# Configure logging
+# Configure logging; unknown or empty LOG_LEVEL values fall back to INFO
+log_level_name = os.getenv('LOG_LEVEL', 'INFO').strip().upper()
+log_level = logging.getLevelNamesMapping().get(log_level_name)
 logging.basicConfig(
-    level=logging.INFO,
+    level=logging.INFO if log_level is None else log_level,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+if log_level is None:
+    logger.warning("Unknown LOG_LEVEL '%s', falling back to INFO", log_level_name)
+
+# Schema and user names are spliced into DDL, so only allow plain identifiers
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z0-9_]+')
+
+# Password alphabet, and the largest multiple of its size that fits in a byte;
+# random bytes at or above the limit are rejected to avoid modulo bias
+PASSWORD_ALPHABET = (string.ascii_letters + string.digits + "!@#$%^&*").encode('ascii')
+PASSWORD_BYTE_LIMIT = (256 // len(PASSWORD_ALPHABET)) * len(PASSWORD_ALPHABET)
 
 
 class DatabaseSchemaManager:
@@ -54,76 +67,92 @@ class DatabaseSchemaManager:
     
     def connect(self) -> None:
         """Establish connection to MySQL server."""
+        # Imported lazily so configuration errors surface before the driver loads
+        import mysql.connector
+        from mysql.connector import Error
+        
         try:
             self.connection = mysql.connector.connect(
                 host=self.host,
                 port=self.port,
                 user=self.root_user,
                 password=self.root_password,
-                autocommit=True
+                autocommit=True,
+                use_pure=False
             )
-            logger.info(f"Successfully connected to MySQL server at {self.host}:{self.port}")
+            logger.info("Successfully connected to MySQL server at %s:%s", self.host, self.port)
         except Error as e:
-            logger.error(f"Error connecting to MySQL: {e}")
+            logger.error("Error connecting to MySQL: %s", e)
             raise
     
     def disconnect(self) -> None:
         """Close MySQL connection."""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("MySQL connection closed")
+        # Close without an is_connected() probe, which costs a ping round trip
+        connection = self.connection
+        self.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+                logger.info("MySQL connection closed")
+            except Exception as e:
+                logger.debug("Ignoring error while closing MySQL connection: %s", e)
     
     def create_schema(self, schema_name: str) -> None:
         """Create a new database schema."""
+        from mysql.connector import Error
+        
         try:
-            cursor = self.connection.cursor()
+            with self.connection.cursor() as cursor:
+                # Create schema; no rows are affected if it already exists
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{schema_name}`")
+                if cursor.rowcount == 0:
+                    logger.warning("Schema '%s' already exists", schema_name)
+                    return
             
-            # Check if schema already exists
-            cursor.execute("SHOW DATABASES LIKE %s", (schema_name,))
-            if cursor.fetchone():
-                logger.warning(f"Schema '{schema_name}' already exists")
-                return
-            
-            # Create schema
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{schema_name}`")
-            logger.info(f"Successfully created schema '{schema_name}'")
+            logger.info("Successfully created schema '%s'", schema_name)
             
         except Error as e:
-            logger.error(f"Error creating schema '{schema_name}': {e}")
+            logger.error("Error creating schema '%s': %s", schema_name, e)
             raise
-        finally:
-            if cursor:
-                cursor.close()
     
     def generate_password(self, length: int = 16) -> str:
         """Generate a secure random password."""
-        alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
-        password = ''.join(secrets.choice(alphabet) for _ in range(length))
-        return password
+        n = len(PASSWORD_ALPHABET)
+        password = bytearray()
+        while len(password) < length:
+            # Draw entropy in one batch rather than one syscall per character
+            for b in secrets.token_bytes(length * 2):
+                if b < PASSWORD_BYTE_LIMIT:
+                    password.append(PASSWORD_ALPHABET[b % n])
+                    if len(password) == length:
+                        break
+        return password.decode()
     
     def create_user_and_grant_permissions(self, username: str, password: str, schema_name: str) -> None:
-        """Create a new MySQL user and grant all privileges on the specified schema."""
+        """Create a new MySQL user and grant all privileges on the specified schema.
+        
+        FLUSH PRIVILEGES is not issued: CREATE USER and GRANT update the in-memory
+        grant tables directly, so a flush would only rebuild the privilege cache.
+        """
+        from mysql.connector import Error
+        
         try:
-            cursor = self.connection.cursor()
-            
-            # Drop user if exists (to handle recreating users)
-            cursor.execute(f"DROP USER IF EXISTS '{username}'@'%'")
-            
-            # Create user
-            cursor.execute(f"CREATE USER '{username}'@'%' IDENTIFIED BY %s", (password,))
-            logger.info(f"Successfully created user '{username}'")
-            
-            # Grant all privileges on the schema
-            cursor.execute(f"GRANT ALL PRIVILEGES ON `{schema_name}`.* TO '{username}'@'%'")
-            cursor.execute("FLUSH PRIVILEGES")
-            logger.info(f"Successfully granted all privileges on '{schema_name}' to user '{username}'")
+            # Drop user if exists (to handle recreating users), create the user and
+            # grant all privileges on the schema in a single round trip
+            statements = (
+                "DROP USER IF EXISTS %s@'%'; "
+                "CREATE USER %s@'%' IDENTIFIED BY %s; "
+                f"GRANT ALL PRIVILEGES ON `{schema_name}`.* TO %s@'%'"
+            )
+            with self.connection.cursor() as cursor:
+                for _ in cursor.execute(statements, (username, username, password, username), multi=True):
+                    pass
+            logger.info("Successfully created user '%s'", username)
+            logger.info("Successfully granted all privileges on '%s' to user '%s'", schema_name, username)
             
         except Error as e:
-            logger.error(f"Error creating user '{username}' or granting permissions: {e}")
+            logger.error("Error creating user '%s' or granting permissions: %s", username, e)
             raise
-        finally:
-            if cursor:
-                cursor.close()
 
 
 class KubernetesSecretManager:
@@ -135,6 +164,8 @@ class KubernetesSecretManager:
         self.namespace_path = "/var/run/secrets/kubernetes.io/serviceaccount/namespace"
         self.api_server_url = None
         self.token = None
+        self._headers = None
+        self._connection = None
         self._setup_cluster_config()
     
     def _setup_cluster_config(self) -> None:
@@ -148,33 +179,96 @@ class KubernetesSecretManager:
                 raise ValueError("KUBERNETES_SERVICE_HOST environment variable not found")
             
             self.api_server_url = f"https://{k8s_host}:{k8s_port}"
-            logger.info(f"Kubernetes API server URL: {self.api_server_url}")
+            logger.info("Kubernetes API server URL: %s", self.api_server_url)
             
             # Read service account token
             if os.path.exists(self.token_path):
-                with open(self.token_path, 'r') as f:
-                    self.token = f.read().strip()
+                # The token is small, so read it straight from the fd without
+                # going through the buffered text IO stack
+                fd = os.open(self.token_path, os.O_RDONLY)
+                try:
+                    self.token = os.read(fd, 65536).decode().strip()
+                finally:
+                    os.close(fd)
                 logger.info("Successfully loaded service account token")
             else:
                 raise FileNotFoundError(f"Service account token not found at {self.token_path}")
+            
+            # Build request headers and TLS context once for all API calls
+            self._headers = {
+                'Authorization': f'Bearer {self.token}',
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            }
+            ca_cert = self.ca_cert_path if os.path.exists(self.ca_cert_path) else None
+            
+            # Reuse a single TLS connection for all API calls; falls back to the
+            # system CA bundle when the mounted CA cert is missing
+            ssl_context = ssl.create_default_context(cafile=ca_cert)
+            self._connection = http.client.HTTPSConnection(
+                k8s_host, int(k8s_port), context=ssl_context, timeout=30
+            )
                 
         except Exception as e:
-            logger.error(f"Error setting up cluster configuration: {e}")
+            logger.error("Error setting up cluster configuration: %s", e)
             raise
     
-    def _get_headers(self) -> Dict[str, str]:
-        """Get HTTP headers for Kubernetes API requests."""
-        return {
-            'Authorization': f'Bearer {self.token}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> Tuple[int, str]:
+        """Send a request over the shared connection and return the status and body.
+        
+        A GET is retried once on a fresh connection if the API server closed the
+        kept-alive connection between calls. Other methods are not resent, since the
+        server may already have applied them before the connection dropped.
+        """
+        # An idle kept-alive socket that is readable has been closed by the server;
+        # drop it so http.client reconnects instead of sending into a dead connection
+        sock = self._connection.sock
+        if sock is not None and select.select([sock], [], [], 0)[0]:
+            self._connection.close()
+        
+        for attempt in range(2):
+            try:
+                self._connection.request(method, path, body=body, headers=self._headers)
+                response = self._connection.getresponse()
+                return response.status, response.read().decode(errors='replace')
+            except (ConnectionResetError, BrokenPipeError):
+                self._connection.close()
+                if attempt or method != "GET":
+                    raise
     
-    def _get_ca_cert_path(self) -> Optional[str]:
-        """Get CA certificate path if it exists."""
-        if os.path.exists(self.ca_cert_path):
-            return self.ca_cert_path
-        return None
+    def _exit_secret_exists(self, namespace: str, secret_name: str) -> None:
+        """Log that the Secret already exists and exit with an error."""
+        logger.error("Secret '%s' already exists in namespace '%s'. "
+                     "This script expects the Secret to not exist. Please investigate and "
+                     "remove the existing Secret if safe to do so, or use a different Secret name.",
+                     secret_name, namespace)
+        sys.exit(1)
+    
+    def check_secret_absent(self, namespace: str, secret_name: str) -> None:
+        """Verify that the Secret does not exist yet, exiting if it does.
+        
+        This is a preflight check so that existing credentials are detected before
+        the database user is recreated with a new password. If the service account
+        may not read the Secret, the check is skipped with a warning.
+        """
+        try:
+            status, response_body = self._request(
+                "GET", f"/api/v1/namespaces/{namespace}/secrets/{secret_name}"
+            )
+            
+            if status == 200:
+                self._exit_secret_exists(namespace, secret_name)
+            elif status == 403:
+                # Older Roles only grant create; the POST still rejects an existing Secret
+                logger.warning("Not permitted to check for existing Secret '%s' in namespace '%s'; "
+                               "relying on the create request to detect it", secret_name, namespace)
+            elif status != 404:
+                logger.error("Failed to check for existing Secret: %s - %s", status, response_body)
+                raise http.client.HTTPException(f"Failed to check for existing Secret: {status}")
+                
+        except (http.client.HTTPException, OSError) as e:
+            logger.error("Error checking for existing Kubernetes Secret: %s", e)
+            raise
     
     def create_secret(self, namespace: str, secret_name: str, username: str, password: str, 
                      schema_name: str, mysql_host: str, mysql_port: int) -> None:
@@ -184,16 +278,14 @@ class KubernetesSecretManager:
         existing credentials could cause unpredictable behavior.
         """
         try:
-            # Prepare secret data (base64 encoded)
+            # Prepare secret data; sent as stringData so the API server does the
+            # base64 encoding when it stores the Secret
             secret_data = {
-                'username': base64.b64encode(username.encode()).decode(),
-                'password': base64.b64encode(password.encode()).decode(),
-                'database': base64.b64encode(schema_name.encode()).decode(),
-                'host': base64.b64encode(mysql_host.encode()).decode(),
-                'port': base64.b64encode(str(mysql_port).encode()).decode(),
-                'connection-string': base64.b64encode(
-                    f"mysql://{username}:{password}@{mysql_host}:{mysql_port}/{schema_name}".encode()
-                ).decode()
+                'username': username,
+                'password': password,
+                'database': schema_name,
+                'host': mysql_host,
+                'port': str(mysql_port)
             }
             
             # Create Secret manifest
@@ -209,61 +301,74 @@ class KubernetesSecretManager:
                     }
                 },
                 "type": "Opaque",
-                "data": secret_data
+                "stringData": secret_data
             }
             
-            # API endpoint for secrets
-            secrets_url = f"{self.api_server_url}/api/v1/namespaces/{namespace}/secrets"
-            
-            headers = self._get_headers()
-            ca_cert = self._get_ca_cert_path()
+            # API endpoint for secrets; a POST is an atomic create-only call (409 if
+            # the Secret exists), and fieldManager records this job as the field owner
+            secrets_path = f"/api/v1/namespaces/{namespace}/secrets?fieldManager=database-schema-creator"
             
             # Attempt to create the secret
             try:
-                post_response = requests.post(
-                    secrets_url,
-                    headers=headers,
-                    data=json.dumps(secret_manifest),
-                    verify=ca_cert,
-                    timeout=30
+                status, response_body = self._request(
+                    "POST", secrets_path, body=orjson.dumps(secret_manifest)
                 )
                 
-                if post_response.status_code in [200, 201]:
-                    logger.info(f"Successfully created Secret '{secret_name}' in namespace '{namespace}'")
-                elif post_response.status_code == 409:
+                if status in [200, 201]:
+                    logger.info("Successfully created Secret '%s' in namespace '%s'", secret_name, namespace)
+                elif status == 409:
                     # Secret already exists - this is an error condition
-                    logger.error(f"Secret '{secret_name}' already exists in namespace '{namespace}'. "
-                               f"This script expects the Secret to not exist. Please investigate and "
-                               f"remove the existing Secret if safe to do so, or use a different Secret name.")
-                    sys.exit(1)
+                    self._exit_secret_exists(namespace, secret_name)
                 else:
-                    logger.error(f"Failed to create Secret: {post_response.status_code} - {post_response.text}")
-                    raise RequestException(f"Failed to create Secret: {post_response.status_code}")
+                    logger.error("Failed to create Secret: %s - %s", status, response_body)
+                    raise http.client.HTTPException(f"Failed to create Secret: {status}")
                     
-            except requests.exceptions.Timeout:
+            except socket.timeout:
                 logger.error("Request to Kubernetes API timed out")
                 raise
-            except requests.exceptions.ConnectionError as e:
-                logger.error(f"Connection error to Kubernetes API: {e}")
+            except ConnectionError as e:
+                logger.error("Connection error to Kubernetes API: %s", e)
                 raise
                 
-        except RequestException as e:
-            logger.error(f"Error creating Kubernetes Secret: {e}")
+        except (http.client.HTTPException, OSError) as e:
+            logger.error("Error creating Kubernetes Secret: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Unexpected error with Kubernetes Secret: {e}")
+            logger.error("Unexpected error with Kubernetes Secret: %s", e)
             raise
+    
+    def close(self) -> None:
+        """Close the connection to the Kubernetes API server."""
+        if self._connection:
+            self._connection.close()
 
 
 def get_required_env_var(var_name: str) -> str:
     """Get required environment variable or exit with error."""
     value = os.getenv(var_name)
     if not value:
-        logger.error(f"Required environment variable '{var_name}' is not set")
+        logger.error("Required environment variable '%s' is not set", var_name)
+        sys.exit(1)
+    return value
+
+
+def validate_identifier(var_name: str, value: str) -> str:
+    """Validate that a MySQL identifier is safe to use in DDL or exit with error."""
+    if not IDENTIFIER_PATTERN.fullmatch(value):
+        logger.error("Environment variable '%s' must contain only letters, digits and underscores", var_name)
         sys.exit(1)
     return value
 
 
+def resolve_ipv4(host: str) -> str:
+    """Resolve a hostname to an IPv4 address once, falling back to the hostname."""
+    try:
+        return socket.gethostbyname(host)
+    except socket.gaierror as e:
+        logger.warning("Could not resolve '%s' to an IPv4 address, using it as-is: %s", host, e)
+        return host
+
+
 def get_optional_env_var(var_name: str, default: str) -> str:
     """Get optional environment variable with default value."""
     return os.getenv(var_name, default)
@@ -278,42 +383,51 @@ def main():
     mysql_port = int(get_optional_env_var('MYSQL_PORT', '3306'))
     mysql_root_user = get_required_env_var('MYSQL_ROOT_USER')
     mysql_root_password = get_required_env_var('MYSQL_ROOT_PASSWORD')
-    schema_name = get_required_env_var('SCHEMA_NAME')
-    db_user = get_required_env_var('DB_USER')
+    schema_name = validate_identifier('SCHEMA_NAME', get_required_env_var('SCHEMA_NAME'))
+    db_user = validate_identifier('DB_USER', get_required_env_var('DB_USER'))
     k8s_namespace = get_required_env_var('K8S_NAMESPACE')
     secret_name = get_required_env_var('SECRET_NAME')
     
     db_manager = None
+    k8s_manager = None
     
     try:
-        # Initialize database manager
+        # Initialize Kubernetes Secret manager
+        k8s_manager = KubernetesSecretManager()
+        
+        # Initialize database manager; connect by address so the driver skips
+        # its own A/AAAA lookup, while the Secret keeps the original hostname
         db_manager = DatabaseSchemaManager(
-            host=mysql_host,
+            host=resolve_ipv4(mysql_host),
             port=mysql_port,
             root_user=mysql_root_user,
             root_password=mysql_root_password
         )
         
-        # Connect to MySQL
-        db_manager.connect()
-        
-        # Create schema
-        logger.info(f"Creating schema '{schema_name}'")
-        db_manager.create_schema(schema_name)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # Check for an existing Secret while the schema is being created
+            preflight = executor.submit(k8s_manager.check_secret_absent, k8s_namespace, secret_name)
+            
+            # Connect to MySQL
+            db_manager.connect()
+            
+            # Create schema
+            logger.info("Creating schema '%s'", schema_name)
+            db_manager.create_schema(schema_name)
+            
+            # Exits before the user is (re)created if the Secret already exists
+            preflight.result()
         
         # Generate password for new user
         user_password = db_manager.generate_password()
-        logger.info(f"Generated password for user '{db_user}'")
+        logger.info("Generated password for user '%s'", db_user)
         
         # Create user and grant permissions
-        logger.info(f"Creating user '{db_user}' and granting permissions")
+        logger.info("Creating user '%s' and granting permissions", db_user)
         db_manager.create_user_and_grant_permissions(db_user, user_password, schema_name)
         
-        # Initialize Kubernetes Secret manager
-        k8s_manager = KubernetesSecretManager()
-        
         # Create Kubernetes Secret (will fail if Secret already exists)
-        logger.info(f"Creating Kubernetes Secret '{secret_name}' in namespace '{k8s_namespace}'")
+        logger.info("Creating Kubernetes Secret '%s' in namespace '%s'", secret_name, k8s_namespace)
         k8s_manager.create_secret(
             namespace=k8s_namespace,
             secret_name=secret_name,
@@ -327,13 +441,15 @@ def main():
         logger.info("Database schema creation and Kubernetes Secret setup completed successfully!")
         
     except Exception as e:
-        logger.error(f"Error during execution: {e}")
+        logger.error("Error during execution: %s", e)
         sys.exit(1)
         
     finally:
-        # Clean up database connection
+        # Clean up database and Kubernetes API connections
         if db_manager:
             db_manager.disconnect()
+        if k8s_manager:
+            k8s_manager.close()
 
 
 if __name__ == "__main__":